@@ -4,18 +4,63 @@ analyze.py
 모델: SamLowe/roberta-base-go_emotions
 
 입력 형식: {id: {speaker, sentence}}
-출력 형식: {id: {speaker, sentence, emotions}}
+출력 형식: {id: {speaker, sentence, emotions, source}} (source: "model" 또는 cascade 1단계 추정치면 "first_stage")
+요약 파일: result/{작품명}_summary.json (작품 / speaker 별 통계, 분석하면서 누적)
+점수 캐시: result/{작품명}_score_cache.json (전체 모델로 분석한 문장 점수만 저장, cascade.py 의 학습 데이터)
+  → preview.py / 이전 분석에서 이미 분석한 문장은 다시 분석하지 않음
 
 play1, play2 동시 처리
+토큰화는 pretokenize.py 의 토큰 저장소를 사용 (없거나 원본이 바뀌었으면 자동 생성)
 """
 
 import json
+import multiprocessing
 import os
-from transformers import pipeline
+import platform
+
+import torch
+from transformers import AutoConfig, AutoModelForSequenceClassification
+
+from cascade import (
+    SOURCE_FIRST_STAGE, SOURCE_MODEL,
+    agreement_report, load_first_stage, select_first_stage,
+)
+from emotion_summary import PlaySummary, save_summary, summary_path, top_emotions
+from pretokenize import build_padded_batch, build_token_store, load_token_store, load_tokenizer
+
+# ============== CONFIG ==============
+MODEL_NAME = "SamLowe/roberta-base-go_emotions"
 
 # 처리할 파일 목록
 PLAY_FILES = ["play1.json", "play2.json"]
 
+# 문장 최대 토큰 길이 (special token 포함)
+MAX_LENGTH = 512
+
+# 한 번의 forward pass 에 넣을 문장 수
+BATCH_SIZE = 32
+
+# torch intra-op 스레드 수 (None 이면 torch 기본값)
+NUM_THREADS = None
+
+# 모델을 따로 로드해서 배치를 나눠 처리할 워커 프로세스 수 (1 이면 현재 프로세스에서 처리)
+NUM_WORKERS = 1
+
+# autotune.py 가 만든 프로파일 (있으면 위 세 설정 대신 사용)
+PROFILE_PATH = "autotune_profile.json"
+
+# cascade 모드: cascade.py 로 학습한 1단계 분류기의 신뢰도가 임계값 이상이면 전체 모델 생략
+CASCADE_MODE = False
+CASCADE_THRESHOLD = 0.8
+# 1단계에서 확정된 문장 중 전체 모델로 다시 분석해서 일치율을 확인할 비율
+CASCADE_AUDIT_RATE = 0.05
+# ====================================
+
+# 워커 프로세스 전역 상태 (init_worker 에서 설정)
+_worker_model = None
+_worker_tokenizer = None
+_worker_stores = {}
+
 
 def load_parsed_json(filepath):
     """파싱된 JSON 파일 로드"""
@@ -24,38 +69,232 @@ def load_parsed_json(filepath):
     return data
 
 
-def analyze_emotions(data, classifier, tokenizer, play_name):
-    """각 문장에 대해 감정 분석 수행"""
-    results = {}
-    total_sentences = len(data)
-    
-    for sentence_id, item in data.items():
-        print(f"[{play_name}] 문장 {sentence_id}/{total_sentences} 분석 중...")
-        
-        # 새 형식: item은 {speaker, sentence} 딕셔너리
-        speaker = item["speaker"]
-        sentence = item["sentence"]
-        
-        # 토큰 길이를 기준으로 정확하게 512 token으로 잘라내기
-        tokens = tokenizer(
-            sentence,
-            max_length=512,
-            truncation=True,
-            return_tensors="pt"
+# 프로파일을 적용할지 판단할 때 비교하는 하드웨어 정보 (hostname 은 컨테이너 / CI 에서 매번 바뀌므로 기록만)
+HOST_MATCH_KEYS = ("machine", "cpu_count", "memory_gb")
+
+
+def total_memory_gb():
+    """전체 물리 메모리 (GB, 알 수 없으면 None)"""
+    try:
+        return round(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024 ** 3)
+    except (AttributeError, ValueError, OSError):  # Windows 등
+        return None
+
+
+def host_info():
+    """프로파일이 어느 머신에서 만들어졌는지 구분하기 위한 정보"""
+    return {
+        "hostname": platform.node(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "memory_gb": total_memory_gb(),
+    }
+
+
+def same_hardware(profile_host, host=None):
+    """프로파일을 만든 머신과 하드웨어 구성이 같은지 (hostname 은 비교하지 않음)"""
+    host = host or host_info()
+    profile_host = profile_host or {}
+    return all(profile_host.get(key) == host[key] for key in HOST_MATCH_KEYS)
+
+
+def load_run_settings(profile_path=PROFILE_PATH, model_name=MODEL_NAME, max_length=MAX_LENGTH):
+    """
+    배치 크기 / 스레드 수 / 워커 수 결정
+    하드웨어 구성(HOST_MATCH_KEYS), 모델, max_length 가 같은 autotune 프로파일이 있으면 그 값을 사용
+    """
+    settings = {
+        "batch_size": BATCH_SIZE,
+        "num_threads": NUM_THREADS,
+        "num_workers": NUM_WORKERS,
+    }
+    if not os.path.exists(profile_path):
+        return settings
+
+    with open(profile_path, 'r', encoding='utf-8') as f:
+        profile = json.load(f)
+
+    if not same_hardware(profile.get("host")):
+        print(f"프로파일이 하드웨어 구성이 다른 머신에서 생성됨, 기본 설정 사용: {profile_path}")
+        return settings
+    if profile.get("model") != model_name:
+        print(f"프로파일 모델({profile.get('model')})이 다름, 기본 설정 사용: {profile_path}")
+        return settings
+    if profile.get("max_length") != max_length:
+        print(f"프로파일 max_length({profile.get('max_length')})가 다름, 기본 설정 사용: {profile_path}")
+        return settings
+
+    settings.update(profile["best"])
+    print(f"autotune 프로파일 적용: {settings}")
+    return settings
+
+
+def load_labels(model_name=MODEL_NAME):
+    """모델 레이블 목록 (id 순서) - 가중치 없이 config 만 로드"""
+    config = AutoConfig.from_pretrained(model_name)
+    return [config.id2label[i] for i in range(config.num_labels)]
+
+
+def load_model_for_pool(model_name, pool):
+    """
+    현재 프로세스용 모델 로드 (워커 풀을 쓰면 모델은 워커에만 있으므로 None)
+    autotune 측정과 같은 메모리 구성 (워커 수만큼의 모델)
+    """
+    if pool is not None:
+        return None
+    return load_model(model_name)
+
+
+def load_model(model_name=MODEL_NAME):
+    """감정 분류 모델 로드 (추론 모드)"""
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+    return model
+
+
+def init_worker(model_name, num_threads):
+    """워커 프로세스 초기화: 스레드 수 설정 후 모델/토크나이저 로드"""
+    global _worker_model, _worker_tokenizer
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    _worker_tokenizer = load_tokenizer(model_name)
+    _worker_model = load_model(model_name)
+
+
+def create_worker_pool(model_name, num_workers, num_threads):
+    """워커 프로세스 풀 생성 (num_workers 가 1 이하면 None)"""
+    if num_workers <= 1:
+        return None
+    context = multiprocessing.get_context("spawn")
+    return context.Pool(
+        num_workers,
+        initializer=init_worker,
+        initargs=(model_name, num_threads),
+    )
+
+
+def _score_batch_in_worker(task):
+    """워커에서 배치 하나 처리 (토큰 저장소는 워커마다 한 번만 memory-map)"""
+    store_dir, play_name, indices, max_length = task
+    key = (store_dir, play_name)
+    if key not in _worker_stores:
+        _worker_stores[key] = load_token_store(store_dir, play_name)
+    store = _worker_stores[key]
+    return indices, score_batch(_worker_model, _worker_tokenizer, store, indices, max_length)
+
+
+def logits_to_scores(logits, config):
+    """
+    logits → 감정 점수 (pipeline 과 동일한 규칙)
+    multi-label 모델(go_emotions)은 sigmoid, 그 외에는 softmax
+    """
+    if config.problem_type == "multi_label_classification" or config.num_labels == 1:
+        return torch.sigmoid(logits)
+    return torch.softmax(logits, dim=-1)
+
+
+def make_batches(store, indices, batch_size):
+    """토큰 길이가 비슷한 문장끼리 묶어서 padding 낭비를 줄인 배치 목록"""
+    offsets = store["offsets"]
+    order = sorted(indices, key=lambda i: offsets[i + 1] - offsets[i])
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+def score_batch(model, tokenizer, store, indices, max_length):
+    """배치 하나의 감정 점수 (문장마다 레이블 순서의 점수 리스트)"""
+    input_ids, attention_mask = build_padded_batch(store, indices, tokenizer, max_length)
+    with torch.no_grad():
+        logits = model(
+            input_ids=torch.from_numpy(input_ids),
+            attention_mask=torch.from_numpy(attention_mask),
+        ).logits
+    return logits_to_scores(logits, model.config).tolist()
+
+
+def score_sentences(model, tokenizer, store, indices, play_name,
+                    batch_size=BATCH_SIZE, max_length=MAX_LENGTH, pool=None, verbose=True,
+                    on_batch=None):
+    """
+    저장소의 문장들(indices)의 감정 점수 계산
+    pool 이 있으면 배치를 워커 프로세스들에 나눠서 처리 (이때 model 은 사용하지 않음)
+    on_batch(batch, scores) 가 있으면 배치가 끝날 때마다 호출
+
+    Returns:
+        {문장 index: 레이블 순서의 점수 리스트}
+    """
+    batches = make_batches(store, indices, batch_size)
+    if pool is None:
+        outputs = (
+            (batch, score_batch(model, tokenizer, store, batch, max_length))
+            for batch in batches
         )
-        truncated_text = tokenizer.decode(tokens["input_ids"][0], skip_special_tokens=True)
-        
-        # 감정 분석 수행
-        model_output = classifier(truncated_text)[0]  # emotion 리스트
-        
-        # 결과 저장 (speaker 정보 포함)
+    else:
+        tasks = [(store["store_dir"], store["play_name"], batch, max_length) for batch in batches]
+        outputs = pool.imap_unordered(_score_batch_in_worker, tasks)
+
+    scores_by_index = {}
+    done = 0
+    for batch, scores in outputs:
+        for i, row in zip(batch, scores):
+            scores_by_index[i] = row
+        if on_batch is not None:
+            on_batch(batch, scores)
+        done += len(batch)
+        if verbose:
+            print(f"[{play_name}] 문장 {done}/{len(indices)} 분석 중...")
+    return scores_by_index
+
+
+def analyze_emotions(data, model, tokenizer, store, play_name, labels,
+                     batch_size=BATCH_SIZE, max_length=MAX_LENGTH, pool=None, precomputed=None,
+                     first_stage_indices=()):
+    """
+    토큰 저장소에서 배치를 만들어 감정 분석 수행
+    배치가 끝날 때마다 작품 / speaker 별 통계를 누적
+    labels: 모델 레이블 목록 (id 순서), model 은 pool 이 있으면 None 이어도 됨
+    precomputed({문장 index: 레이블 순서 점수})에 있는 문장은 모델을 거치지 않고 그 점수를 사용
+    first_stage_indices 의 문장은 결과에 "source": "first_stage" 로 표시 (나머지는 "model")
+
+    Returns:
+        results: {id: {speaker, sentence, emotions}}
+        summary: PlaySummary
+    """
+    sentence_ids = store["sentence_ids"]
+    summary = PlaySummary(play_name, labels)
+
+    def accumulate(batch, scores):
+        for i, row in zip(batch, scores):
+            summary.update(data[sentence_ids[i]]["speaker"], row)
+
+    precomputed = precomputed or {}
+    if precomputed:
+        print(f"[{play_name}] 이미 계산된 문장 {len(precomputed)}개는 모델 분석 생략")
+        accumulate(list(precomputed), list(precomputed.values()))
+
+    todo = [i for i in range(len(sentence_ids)) if i not in precomputed]
+    scores_by_index = score_sentences(
+        model, tokenizer, store, todo, play_name,
+        batch_size=batch_size, max_length=max_length, pool=pool, on_batch=accumulate,
+    )
+    scores_by_index.update(precomputed)
+
+    # 원래 문장 순서대로 결과 저장 (speaker 정보 포함)
+    results = {}
+    for i, sentence_id in enumerate(sentence_ids):
+        item = data[sentence_id]
+        emotions = [
+            {"label": labels[label_idx], "score": score}
+            for label_idx, score in enumerate(scores_by_index[i])
+        ]
+        emotions.sort(key=lambda x: x["score"], reverse=True)
         results[sentence_id] = {
-            "speaker": speaker,
-            "sentence": sentence,
-            "emotions": model_output
+            "speaker": item["speaker"],
+            "sentence": item["sentence"],
+            "emotions": emotions,
+            "source": SOURCE_FIRST_STAGE if i in first_stage_indices else SOURCE_MODEL,
         }
-    
-    return results
+
+    return results, summary
 
 
 def save_results(results, output_path):
@@ -68,30 +307,108 @@ def save_results(results, output_path):
     print(f"결과 저장 완료: {output_path}")
 
 
-def print_summary(results, play_name):
-    """간단한 요약 출력"""
-    print(f"\n=== [{play_name}] 분석 요약 (상위 10개 문장) ===")
-    for i, (sentence_id, result) in enumerate(results.items()):
-        if i >= 10:
-            break
-        top_emotion = max(result["emotions"], key=lambda x: x["score"])
-        print(f"문장 {sentence_id} ({result['speaker']}): {top_emotion['label']} ({top_emotion['score']:.4f})")
+def score_cache_path(output_path):
+    """result/{작품명}_result.json → result/{작품명}_score_cache.json"""
+    return output_path.replace("_result.json", "_score_cache.json")
 
 
-def main():
-    # 모델 한 번만 로드
-    print("모델 로딩 중...")
-    classifier = pipeline(
-        task="text-classification", 
-        model="SamLowe/roberta-base-go_emotions", 
-        top_k=None,
-        truncation=True,
-        max_length=512
-    )
-    tokenizer = classifier.tokenizer
-    print("모델 로딩 완료!\n")
-    
-    # play1, play2 순차 처리
+def load_score_cache(cache_path, store, model_name=MODEL_NAME, max_length=MAX_LENGTH):
+    """
+    미리 계산해 둔 문장 점수 로드
+    모델 / max_length 가 같고 문장 내용(sha1)이 바뀌지 않은 문장만 사용
+
+    Returns:
+        {문장 index: 레이블 순서 점수 리스트}
+    """
+    if not os.path.exists(cache_path):
+        return {}
+    with open(cache_path, 'r', encoding='utf-8') as f:
+        cache = json.load(f)
+    if cache.get("model") != model_name or cache.get("max_length") != max_length:
+        return {}
+
+    hashes = store["meta"]["sentence_sha1"]
+    reused = {}
+    for i, sentence_id in enumerate(store["sentence_ids"]):
+        entry = cache["scores"].get(sentence_id)
+        if entry is not None and entry["sha1"] == hashes[i]:
+            reused[i] = entry["scores"]
+    return reused
+
+
+def save_score_cache(cache_path, store, scores_by_index, labels,
+                     model_name=MODEL_NAME, max_length=MAX_LENGTH):
+    """
+    전체 모델 문장 점수를 캐시 파일로 저장 (문장 ID 기준, 문장 내용 sha1 포함)
+    cascade 1단계 추정치는 넣지 않음 (cascade.py 가 이 파일로 학습)
+    """
+    sentence_ids = store["sentence_ids"]
+    hashes = store["meta"]["sentence_sha1"]
+    cache = {
+        "model": model_name,
+        "max_length": max_length,
+        "labels": list(labels),
+        "scores": {
+            sentence_ids[i]: {"sha1": hashes[i], "scores": list(scores)}
+            for i, scores in sorted(scores_by_index.items())
+        },
+    }
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False)
+
+
+def result_scores(results, sentence_ids, labels, indices):
+    """결과 딕셔너리 → {문장 index: 레이블 순서 점수 리스트} (indices 의 문장만)"""
+    label_index = {label: idx for idx, label in enumerate(labels)}
+    scores_by_index = {}
+    for i in indices:
+        row = [0.0] * len(labels)
+        for emotion in results[sentence_ids[i]]["emotions"]:
+            row[label_index[emotion["label"]]] = emotion["score"]
+        scores_by_index[i] = row
+    return scores_by_index
+
+
+def save_cascade_report(report, output_path):
+    """cascade 보고서 저장 및 출력"""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    def ratio(value):
+        return f"{value:.3f}" if value is not None else "-"
+
+    print(f"\ncascade (임계값 {report['threshold']}): "
+          f"1단계 확정 {report['first_stage_only']}/{report['total']} ({report['first_stage_ratio']:.1%}), "
+          f"검증 {report['audited']}문장 일치율 {ratio(report['audited_agreement'])}, "
+          f"캐시 {report['cached']}문장 일치율 {ratio(report['cached_agreement'])}, "
+          f"저신뢰 문장 일치율 {ratio(report['rejected_agreement'])}")
+    print(f"cascade 보고서 저장 완료: {output_path}")
+
+
+def print_summary(summary, play_name):
+    """요약 파일 내용 출력 (작품 전체 + speaker 별 평균 상위 3개 감정)"""
+    def describe(stats):
+        top = ", ".join(f"{label}({score:.3f})" for label, score in top_emotions(stats))
+        most_frequent = next(iter(stats["top_labels"]), "-")
+        return f"{stats['count']}문장 | 평균 상위: {top} | 최다 1위: {most_frequent}"
+
+    print(f"\n=== [{play_name}] 분석 요약 ===")
+    print(f"전체: {describe(summary['play_stats'])}")
+    for speaker, stats in summary["speakers"].items():
+        print(f"{speaker}: {describe(stats)}")
+
+
+def analyze_plays(model, tokenizer, labels, settings, pool=None):
+    """PLAY_FILES 의 작품들을 순차 분석"""
+    first_stage = None
+    if CASCADE_MODE:
+        first_stage = load_first_stage()
+        if first_stage is None:
+            print("1단계 분류기가 없어 cascade 모드 없이 분석합니다. (python cascade.py 로 학습)")
+        elif first_stage["labels"] != labels:
+            raise ValueError("1단계 분류기의 레이블이 모델 레이블과 다릅니다. cascade.py 로 다시 학습하세요.")
+
     for filename in PLAY_FILES:
         input_path = os.path.join("data", "parsed", filename)
         
@@ -108,12 +425,73 @@ def main():
         output_filename = f"{play_name}_result.json"
         output_path = os.path.join("result", output_filename)
         
-        # 로드, 분석, 저장
+        # 로드, 토큰 저장소 준비, 분석, 저장
         data = load_parsed_json(input_path)
-        results = analyze_emotions(data, classifier, tokenizer, play_name)
+        store = build_token_store(input_path, tokenizer)
+
+        # preview.py / 이전 분석에서 전체 모델로 이미 분석한 문장
+        cached = load_score_cache(score_cache_path(output_path), store)
+
+        # cascade: 1단계 신뢰도가 높은 문장은 전체 모델 생략 (이미 분석한 문장은 그 점수 사용)
+        # 신뢰도가 높지만 전체 모델 점수가 이미 있는 문장은 보고서에서 따로 집계
+        accepted = {}
+        confident_cached = []
+        if first_stage is not None:
+            accepted, predictions, audited = select_first_stage(
+                first_stage, data, store["sentence_ids"], CASCADE_THRESHOLD, CASCADE_AUDIT_RATE,
+            )
+            confident_cached = [i for i in cached if i in accepted or i in audited]
+            for i in confident_cached:
+                accepted.pop(i, None)
+            audited = [i for i in audited if i not in cached]
+        precomputed = {**accepted, **cached}
+
+        results, summary = analyze_emotions(
+            data, model, tokenizer, store, play_name, labels,
+            batch_size=settings["batch_size"], pool=pool, precomputed=precomputed,
+            first_stage_indices=accepted,
+        )
         save_results(results, output_path)
-        print_summary(results, play_name)
-    
+        save_summary(summary, summary_path(output_path))
+
+        # 전체 모델 점수는 1단계 추정치와 섞이지 않도록 점수 캐시에 따로 저장
+        # (다음 분석에서 재사용 + cascade.py 학습 데이터)
+        full_model = [i for i in range(len(store["sentence_ids"])) if i not in accepted]
+        save_score_cache(
+            score_cache_path(output_path), store,
+            result_scores(results, store["sentence_ids"], labels, full_model), labels,
+        )
+        print_summary(summary.to_dict(), play_name)
+
+        if first_stage is not None:
+            report = agreement_report(
+                results, store["sentence_ids"], predictions, accepted, audited,
+                first_stage["labels"], CASCADE_THRESHOLD, cached=confident_cached,
+            )
+            save_cascade_report(report, output_path.replace("_result.json", "_cascade.json"))
+
+
+def main():
+    # 배치 크기 / 스레드 / 워커 설정 (autotune 프로파일 우선)
+    settings = load_run_settings()
+    if settings["num_threads"]:
+        torch.set_num_threads(settings["num_threads"])
+
+    # 모델 한 번만 로드 (워커 풀을 쓰면 각 워커에서만 로드)
+    print("모델 로딩 중...")
+    tokenizer = load_tokenizer(MODEL_NAME)
+    labels = load_labels(MODEL_NAME)
+    pool = create_worker_pool(MODEL_NAME, settings["num_workers"], settings["num_threads"])
+    model = load_model_for_pool(MODEL_NAME, pool)
+    print("모델 로딩 완료!\n")
+
+    try:
+        analyze_plays(model, tokenizer, labels, settings, pool)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
     print("\n\n모든 작품 분석 완료!")
 
 
@@ -0,0 +1,314 @@
+"""
+autotune.py
+현재 머신에 맞는 감정 분석 실행 설정 탐색
+- 배치 크기 (batch_size)
+- torch intra-op 스레드 수 (num_threads)
+- 워커 프로세스 수 (num_workers)
+
+실제 코퍼스(data/parsed/*.json)에서 뽑은 샘플로 짧은 시간 측정을 반복하고
+가장 빠른 설정을 autotune_profile.json 에 저장 → analyze.py 가 자동으로 사용
+
+탐색 방식:
+- (워커 수 × 스레드 수) 가 CPU 코어 수를 넘지 않는 조합마다
+  배치 크기를 작은 것부터 늘려가며 측정
+- 처리 속도가 지금까지 최고치보다 EARLY_STOP_RATIO 이상 떨어지면 더 큰 배치는 생략
+- 각 측정은 별도 프로세스에서 실행 (스레드 설정 / 최대 메모리를 측정마다 독립적으로 측정하기 위해)
+"""
+
+import json
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import time
+import traceback
+
+import torch
+
+from analyze import (
+    MAX_LENGTH, MODEL_NAME, PLAY_FILES, PROFILE_PATH,
+    create_worker_pool, host_info, load_model_for_pool, score_sentences,
+)
+from pretokenize import build_token_store, load_token_store, load_tokenizer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ============== CONFIG ==============
+# 측정에 사용할 문장 수 (전체 작품에서 무작위 추출)
+SAMPLE_SIZE = 256
+SEED = 0
+
+# 탐색 후보
+BATCH_SIZES = [4, 8, 16, 32, 64, 128]
+WORKER_COUNTS = [1, 2, 4]
+THREAD_COUNTS = None  # None 이면 1, 2, 4, ... CPU 코어 수까지
+
+# 처리 속도가 최고치의 이 비율 아래로 떨어지면 더 큰 배치는 측정하지 않음
+EARLY_STOP_RATIO = 0.9
+
+# 최대 메모리 제한 (MB, None 이면 제한 없음)
+MAX_MEMORY_MB = None
+
+# 측정 한 번의 시간 제한 (초): 넘으면 측정 프로세스를 종료하고 실패로 기록
+TRIAL_TIMEOUT_SEC = 600
+# ====================================
+
+
+def default_thread_counts():
+    """1, 2, 4, ... CPU 코어 수"""
+    cpu_count = os.cpu_count() or 1
+    counts = []
+    n = 1
+    while n < cpu_count:
+        counts.append(n)
+        n *= 2
+    counts.append(cpu_count)
+    return counts
+
+
+def sample_corpus(tokenizer, sample_size=SAMPLE_SIZE, seed=SEED):
+    """
+    전체 작품에서 문장 샘플 추출
+
+    Returns:
+        [(store_dir, play_name, [문장 index, ...]), ...]
+    """
+    candidates = []
+    for filename in PLAY_FILES:
+        input_path = os.path.join("data", "parsed", filename)
+        if not os.path.exists(input_path):
+            print(f"파일 없음, 건너뜀: {input_path}")
+            continue
+        store = build_token_store(input_path, tokenizer)
+        for i in range(len(store["sentence_ids"])):
+            candidates.append((store["store_dir"], store["play_name"], i))
+
+    rng = random.Random(seed)
+    picked = rng.sample(candidates, min(sample_size, len(candidates)))
+
+    by_store = {}
+    for store_dir, play_name, i in picked:
+        by_store.setdefault((store_dir, play_name), []).append(i)
+    return [(store_dir, play_name, sorted(indices)) for (store_dir, play_name), indices in by_store.items()]
+
+
+def peak_memory_mb(num_workers):
+    """
+    현재 프로세스 + 워커들의 최대 메모리 사용량 추정 (MB)
+    자식 프로세스는 가장 큰 워커의 최대치 × 워커 수로 추정
+    """
+    if resource is None:
+        return None
+    # Linux 는 KB, macOS 는 byte 단위
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    self_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit
+    child_peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit
+    if num_workers <= 1:
+        return self_peak
+    return self_peak + child_peak * num_workers
+
+
+def trial_settings(batch_size, num_threads, num_workers):
+    """측정 결과에 공통으로 들어가는 설정 값"""
+    return {
+        "batch_size": batch_size,
+        "num_threads": num_threads,
+        "num_workers": num_workers,
+    }
+
+
+def run_trial(result_queue, sample, batch_size, num_threads, num_workers):
+    """
+    측정 한 번 (별도 프로세스에서 실행): 결과를 result_queue 로 전달
+    예외가 나면 실패 결과를 전달 (OOM 등으로 프로세스가 죽는 경우는 measure 에서 처리)
+    """
+    try:
+        sentences_per_sec = time_trial(sample, batch_size, num_threads, num_workers)
+    except Exception:
+        result_queue.put({
+            **trial_settings(batch_size, num_threads, num_workers),
+            "failed": True,
+            "error": traceback.format_exc(limit=3),
+            "sentences_per_sec": None,
+            "peak_memory_mb": None,
+        })
+        return
+
+    result_queue.put({
+        **trial_settings(batch_size, num_threads, num_workers),
+        "failed": False,
+        "sentences_per_sec": sentences_per_sec,
+        "peak_memory_mb": peak_memory_mb(num_workers),
+    })
+
+
+def time_trial(sample, batch_size, num_threads, num_workers):
+    """샘플 분석 속도 측정 (문장/초)"""
+    torch.set_num_threads(num_threads)
+    tokenizer = load_tokenizer(MODEL_NAME)
+    pool = create_worker_pool(MODEL_NAME, num_workers, num_threads)
+    model = load_model_for_pool(MODEL_NAME, pool)
+    stores = [(load_token_store(store_dir, play_name), indices) for store_dir, play_name, indices in sample]
+
+    try:
+        # 워밍업: 워커마다 배치 하나씩 처리 (모델 로딩 / 첫 실행 비용 제외)
+        store, indices = stores[0]
+        warmup = indices[:batch_size * max(1, num_workers)]
+        score_sentences(model, tokenizer, store, warmup, "warmup",
+                        batch_size=batch_size, max_length=MAX_LENGTH, pool=pool, verbose=False)
+
+        num_sentences = 0
+        start = time.perf_counter()
+        for store, indices in stores:
+            score_sentences(model, tokenizer, store, indices, store["play_name"],
+                            batch_size=batch_size, max_length=MAX_LENGTH, pool=pool, verbose=False)
+            num_sentences += len(indices)
+        elapsed = time.perf_counter() - start
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return num_sentences / elapsed
+
+
+def measure(sample, batch_size, num_threads, num_workers, timeout=TRIAL_TIMEOUT_SEC):
+    """
+    별도 프로세스에서 run_trial 실행 후 결과 반환
+    프로세스가 결과 없이 죽거나(예외, OOM kill) 시간 제한을 넘으면 실패 결과 반환
+    """
+    context = multiprocessing.get_context("spawn")
+    result_queue = context.Queue()
+    process = context.Process(
+        target=run_trial,
+        args=(result_queue, sample, batch_size, num_threads, num_workers),
+    )
+    process.start()
+
+    deadline = time.monotonic() + timeout
+    result = None
+    error = None
+    while result is None:
+        try:
+            result = result_queue.get(timeout=1.0)
+        except queue.Empty:
+            if not process.is_alive():
+                # 종료 직전에 보낸 결과가 남아 있을 수 있으므로 한 번 더 확인
+                try:
+                    result = result_queue.get(timeout=1.0)
+                except queue.Empty:
+                    error = f"측정 프로세스가 결과 없이 종료됨 (exit code {process.exitcode})"
+                break
+            if time.monotonic() > deadline:
+                process.terminate()
+                error = f"시간 제한 {timeout}초 초과"
+                break
+
+    process.join()
+    if result is None:
+        result = {
+            **trial_settings(batch_size, num_threads, num_workers),
+            "failed": True,
+            "error": error,
+            "sentences_per_sec": None,
+            "peak_memory_mb": None,
+        }
+    return result
+
+
+def within_memory_limit(trial, max_memory_mb=MAX_MEMORY_MB):
+    """메모리 제한 안에 들어오는 측정인지"""
+    if max_memory_mb is None or trial["peak_memory_mb"] is None:
+        return True
+    return trial["peak_memory_mb"] <= max_memory_mb
+
+
+def is_usable(trial):
+    """프로파일 후보가 될 수 있는 측정인지 (성공 + 메모리 제한 이내)"""
+    return not trial["failed"] and within_memory_limit(trial)
+
+
+def search(sample):
+    """워커 수 × 스레드 수 조합마다 배치 크기를 늘려가며 측정"""
+    cpu_count = os.cpu_count() or 1
+    thread_counts = THREAD_COUNTS or default_thread_counts()
+
+    trials = []
+    for num_workers in WORKER_COUNTS:
+        for num_threads in thread_counts:
+            if num_workers * num_threads > cpu_count:
+                continue
+
+            best_sps = 0.0
+            for batch_size in BATCH_SIZES:
+                trial = measure(sample, batch_size, num_threads, num_workers)
+                trials.append(trial)
+                if trial["failed"]:
+                    # 실패한 설정보다 큰 배치는 더 측정하지 않음
+                    print(f"  workers={num_workers} threads={num_threads} batch={batch_size}: "
+                          f"실패 - {trial['error'].strip().splitlines()[-1]}")
+                    break
+
+                memory = trial["peak_memory_mb"]
+                memory_text = f"{memory:.0f}MB" if memory is not None else "?"
+                print(f"  workers={num_workers} threads={num_threads} batch={batch_size}: "
+                      f"{trial['sentences_per_sec']:.1f} 문장/초, 메모리 {memory_text}")
+
+                if not within_memory_limit(trial):
+                    break
+                if trial["sentences_per_sec"] < best_sps * EARLY_STOP_RATIO:
+                    break
+                best_sps = max(best_sps, trial["sentences_per_sec"])
+    return trials
+
+
+def save_profile(trials, sample_size, profile_path=PROFILE_PATH):
+    """가장 빠른 설정을 프로파일로 저장"""
+    candidates = [t for t in trials if is_usable(t)]
+    if not candidates:
+        raise ValueError("성공했고 메모리 제한 안에 들어오는 설정이 없습니다")
+    best = max(candidates, key=lambda t: t["sentences_per_sec"])
+
+    profile = {
+        "host": host_info(),
+        "model": MODEL_NAME,
+        "max_length": MAX_LENGTH,
+        "sample_size": sample_size,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "best": {
+            "batch_size": best["batch_size"],
+            "num_threads": best["num_threads"],
+            "num_workers": best["num_workers"],
+        },
+        "best_sentences_per_sec": best["sentences_per_sec"],
+        "trials": trials,
+    }
+    with open(profile_path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, ensure_ascii=False, indent=2)
+
+    print(f"\n최적 설정: {profile['best']} ({best['sentences_per_sec']:.1f} 문장/초)")
+    print(f"프로파일 저장 완료: {profile_path}")
+    return profile
+
+
+def main():
+    print("토크나이저 로딩 중...")
+    tokenizer = load_tokenizer(MODEL_NAME)
+
+    sample = sample_corpus(tokenizer)
+    sample_size = sum(len(indices) for _, _, indices in sample)
+    if sample_size == 0:
+        print("측정할 문장이 없습니다. data/parsed/ 를 확인하세요.")
+        return
+    print(f"샘플 문장 수: {sample_size}개, CPU 코어 수: {os.cpu_count()}\n")
+
+    trials = search(sample)
+    save_profile(trials, sample_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+cascade.py
+cascade 분석의 1단계: 전체 모델 결과로 학습한 가벼운 어휘 / n-gram 분류기
+
+- 학습: 점수 캐시(result/{작품명}_score_cache.json)의 전체 모델 점수와 원본 문장으로
+  (결과 파일은 cascade 모드에서 1단계 추정치가 섞이므로 사용하지 않음,
+   점수 캐시는 analyze.py / preview.py 가 전체 모델로 분석한 문장만 누적)
+  (1) 정규화한 문장 전체가 같은 경우의 평균 점수 ("Yes.", "Well?" 같은 짧은 대사)
+  (2) unigram / bigram 별 평균 점수 벡터
+  를 저장 (result/cascade_first_stage.json)
+- 예측: 문장 전체가 학습 데이터에 충분히 있으면 그 평균, 아니면 n-gram 평균들의 가중 평균
+  신뢰도 = 예측 벡터의 최고 점수
+- analyze.py 의 CASCADE_MODE 에서 신뢰도가 임계값 이상인 문장은 1단계 점수를 그대로 쓰고,
+  나머지만 전체 모델로 분석
+
+python cascade.py 로 학습하면 검증 데이터에서 임계값별
+"1단계에서 끝나는 비율 / 전체 모델과 top 레이블이 일치하는 비율" 표를 출력
+"""
+
+import json
+import os
+import random
+import re
+from collections import Counter
+
+import numpy as np
+
+from pretokenize import text_sha1
+
+# ============== CONFIG ==============
+# 학습에 사용할 작품 (data/parsed/{작품}.json 의 문장 + result/{작품명}_score_cache.json 의 점수)
+PLAY_FILES = ["play1.json", "play2.json"]
+
+# 학습된 1단계 분류기 저장 경로
+FIRST_STAGE_PATH = os.path.join("result", "cascade_first_stage.json")
+
+# n-gram 이 이 횟수 이상 등장해야 사용
+MIN_FEATURE_COUNT = 2
+
+# 문장 전체가 이 횟수 이상 등장하면 n-gram 대신 문장 평균을 사용
+MIN_EXACT_COUNT = 2
+
+# n-gram 가중치 = count / (count + FEATURE_SMOOTHING)
+FEATURE_SMOOTHING = 5.0
+
+# 전체 평균(prior)의 가중치
+PRIOR_WEIGHT = 1.0
+
+# 학습 시 검증용으로 떼어둘 비율과 검증 표에 출력할 임계값
+HOLDOUT_RATIO = 0.2
+REPORT_THRESHOLDS = [0.5, 0.6, 0.7, 0.8, 0.9, 0.95]
+SEED = 0
+# ====================================
+
+# 결과 파일의 문장별 "source": 점수를 만든 단계
+SOURCE_MODEL = "model"
+SOURCE_FIRST_STAGE = "first_stage"
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+|[^\sa-z0-9']")
+
+
+def normalize(sentence):
+    """소문자 + 공백 정리"""
+    return " ".join(sentence.lower().split())
+
+
+def extract_features(text):
+    """정규화된 문장 → unigram + bigram 목록"""
+    tokens = TOKEN_PATTERN.findall(text)
+    features = list(tokens)
+    features.extend(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    return features
+
+
+def load_training_data(play_files=PLAY_FILES):
+    """
+    점수 캐시의 전체 모델 점수 → (문장, 레이블 순서 점수 벡터) 리스트
+    원본 문장이 바뀐 항목(sha1 불일치)은 제외
+
+    Returns:
+        labels, examples
+    """
+    labels = None
+    model_name = None
+    examples = []
+    for filename in play_files:
+        play_name = os.path.splitext(filename)[0]
+        input_path = os.path.join("data", "parsed", filename)
+        cache_path = os.path.join("result", f"{play_name}_score_cache.json")
+        if not (os.path.exists(input_path) and os.path.exists(cache_path)):
+            print(f"원본 또는 점수 캐시 없음, 건너뜀: {cache_path}")
+            continue
+
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if "labels" not in cache:
+            print(f"레이블 정보가 없는 예전 점수 캐시, 건너뜀 (analyze.py 로 다시 분석): {cache_path}")
+            continue
+        if labels is None:
+            labels, model_name = cache["labels"], cache["model"]
+        elif (labels, model_name) != (cache["labels"], cache["model"]):
+            raise ValueError(f"모델 / 레이블 구성이 다른 점수 캐시입니다: {cache_path}")
+
+        with open(input_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        stale = 0
+        for sentence_id, entry in cache["scores"].items():
+            item = data.get(sentence_id)
+            if item is None or text_sha1(item["sentence"]) != entry["sha1"]:
+                stale += 1
+                continue
+            examples.append((item["sentence"], np.array(entry["scores"])))
+        if stale:
+            print(f"{cache_path}: 원본과 다른 문장 {stale}개 제외")
+    return labels, examples
+
+
+def train_first_stage(labels, examples):
+    """n-gram / 문장 평균 점수 테이블 학습"""
+    num_labels = len(labels)
+    feature_sums = {}
+    feature_counts = Counter()
+    exact_sums = {}
+    exact_counts = Counter()
+    prior = np.zeros(num_labels)
+
+    for sentence, vector in examples:
+        text = normalize(sentence)
+        prior += vector
+        exact_counts[text] += 1
+        exact_sums[text] = exact_sums.get(text, 0) + vector
+        for feature in set(extract_features(text)):
+            feature_counts[feature] += 1
+            feature_sums[feature] = feature_sums.get(feature, 0) + vector
+
+    return {
+        "labels": list(labels),
+        "prior": prior / max(1, len(examples)),
+        "features": {
+            feature: (count, feature_sums[feature] / count)
+            for feature, count in feature_counts.items()
+            if count >= MIN_FEATURE_COUNT
+        },
+        "exact": {
+            text: (count, exact_sums[text] / count)
+            for text, count in exact_counts.items()
+            if count >= MIN_EXACT_COUNT
+        },
+    }
+
+
+def predict(stage, sentence):
+    """
+    1단계 예측
+
+    Returns:
+        (레이블 순서 점수 벡터, 신뢰도)
+    """
+    text = normalize(sentence)
+    if text in stage["exact"]:
+        vector = stage["exact"][text][1]
+        return vector, float(vector.max())
+
+    total = stage["prior"] * PRIOR_WEIGHT
+    weight_sum = PRIOR_WEIGHT
+    # 학습과 같게 n-gram 은 문장당 한 번만 반영 ("no, no, no" 같은 반복이 가중치를 부풀리지 않도록)
+    # (set 대신 dict.fromkeys: 순서를 고정해서 실행마다 같은 신뢰도)
+    for feature in dict.fromkeys(extract_features(text)):
+        entry = stage["features"].get(feature)
+        if entry is None:
+            continue
+        count, mean = entry
+        weight = count / (count + FEATURE_SMOOTHING)
+        total = total + mean * weight
+        weight_sum += weight
+    vector = total / weight_sum
+    return vector, float(vector.max())
+
+
+def save_first_stage(stage, output_path=FIRST_STAGE_PATH):
+    """1단계 분류기 저장"""
+    def pack(table):
+        return {key: [count, [round(float(v), 5) for v in mean]] for key, (count, mean) in table.items()}
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "labels": stage["labels"],
+            "prior": [float(v) for v in stage["prior"]],
+            "features": pack(stage["features"]),
+            "exact": pack(stage["exact"]),
+        }, f, ensure_ascii=False)
+    print(f"1단계 분류기 저장 완료: {output_path} "
+          f"(n-gram {len(stage['features'])}개, 문장 {len(stage['exact'])}개)")
+
+
+def load_first_stage(filepath=FIRST_STAGE_PATH):
+    """1단계 분류기 로드 (없으면 None)"""
+    if not os.path.exists(filepath):
+        return None
+    with open(filepath, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+
+    def unpack(table):
+        return {key: (count, np.array(mean)) for key, (count, mean) in table.items()}
+
+    return {
+        "labels": raw["labels"],
+        "prior": np.array(raw["prior"]),
+        "features": unpack(raw["features"]),
+        "exact": unpack(raw["exact"]),
+    }
+
+
+def select_first_stage(stage, data, sentence_ids, threshold, audit_rate=0.0, seed=SEED):
+    """
+    신뢰도가 threshold 이상인 문장은 1단계 점수로 확정
+
+    audit_rate 비율만큼은 확정된 문장도 전체 모델로 다시 분석해서 일치율 측정에 사용
+
+    Returns:
+        accepted: {문장 index: 1단계 점수 리스트} - 전체 모델을 건너뛸 문장
+        predictions: {문장 index: 1단계 점수 벡터} - 모든 문장 (일치율 계산용)
+        audited: 확정됐지만 검증을 위해 전체 모델로 보내는 문장 index 목록
+    """
+    rng = random.Random(seed)
+    accepted = {}
+    predictions = {}
+    audited = []
+    for i, sentence_id in enumerate(sentence_ids):
+        vector, confidence = predict(stage, data[sentence_id]["sentence"])
+        predictions[i] = vector
+        if confidence < threshold:
+            continue
+        if rng.random() < audit_rate:
+            audited.append(i)
+        else:
+            accepted[i] = vector.tolist()
+    return accepted, predictions, audited
+
+
+def agreement_report(results, sentence_ids, predictions, accepted, audited, labels, threshold, cached=()):
+    """
+    1단계와 전체 모델의 top 레이블 일치율 보고서
+    - audited: 1단계에서 확정될 문장을 전체 모델로 다시 본 결과 (실제로 감수하는 오차 추정)
+    - cached: 1단계에서 확정될 문장이지만 전체 모델 점수가 이미 캐시에 있어서 그 점수를 쓴 문장
+      (전체 모델 레이블을 알고 있으므로 audited 와 같은 의미의 일치율)
+    - rejected: 신뢰도가 낮아 전체 모델로 보낸 문장에서의 일치율 (참고용)
+    """
+    confident = set(accepted) | set(audited) | set(cached)
+
+    def agreement(indices):
+        if not indices:
+            return None
+        same = 0
+        for i in indices:
+            full_top = max(results[sentence_ids[i]]["emotions"], key=lambda x: x["score"])["label"]
+            same += labels[int(np.argmax(predictions[i]))] == full_top
+        return same / len(indices)
+
+    rejected = [i for i in range(len(sentence_ids)) if i not in confident]
+    return {
+        "threshold": threshold,
+        "total": len(sentence_ids),
+        "first_stage_only": len(accepted),
+        "cached": len(cached),
+        "full_model": len(sentence_ids) - len(accepted) - len(cached),
+        "first_stage_ratio": len(accepted) / max(1, len(sentence_ids)),
+        "audited": len(audited),
+        "audited_agreement": agreement(audited),
+        "cached_agreement": agreement(list(cached)),
+        "rejected_agreement": agreement(rejected),
+    }
+
+
+def evaluate(stage, examples, thresholds=REPORT_THRESHOLDS):
+    """
+    검증 데이터에서 임계값별 (1단계 확정 비율, 확정 문장 중 top 레이블 일치율)
+    examples 는 load_training_data() 의 전체 모델 점수 (1단계 자신과 비교하지 않도록)
+    """
+    predictions = [predict(stage, sentence) for sentence, _ in examples]
+    rows = []
+    for threshold in thresholds:
+        accepted = [
+            (vector, target)
+            for (vector, confidence), (_, target) in zip(predictions, examples)
+            if confidence >= threshold
+        ]
+        agree = sum(int(np.argmax(v) == np.argmax(t)) for v, t in accepted)
+        rows.append({
+            "threshold": threshold,
+            "first_stage_ratio": len(accepted) / max(1, len(examples)),
+            "agreement": agree / len(accepted) if accepted else None,
+        })
+    return rows
+
+
+def main():
+    labels, examples = load_training_data()
+    if not examples:
+        print("학습할 결과가 없습니다. 먼저 analyze.py 를 실행하세요.")
+        return
+    print(f"학습 문장 수: {len(examples)}개")
+
+    # 검증 데이터로 임계값별 성능 확인
+    shuffled = list(examples)
+    random.Random(SEED).shuffle(shuffled)
+    split = int(len(shuffled) * (1 - HOLDOUT_RATIO))
+    holdout_stage = train_first_stage(labels, shuffled[:split])
+
+    print(f"\n=== 검증 ({len(shuffled) - split}문장) ===")
+    print("임계값 | 1단계 확정 비율 | top 레이블 일치율")
+    for row in evaluate(holdout_stage, shuffled[split:]):
+        agreement = f"{row['agreement']:.3f}" if row["agreement"] is not None else "-"
+        print(f"{row['threshold']:.2f}   | {row['first_stage_ratio']:.3f}          | {agreement}")
+
+    # 전체 데이터로 다시 학습해서 저장
+    print()
+    save_first_stage(train_first_stage(labels, examples))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+emotion_summary.py
+감정 점수를 문장 단위로 받아 작품 / speaker 별 통계를 온라인으로 누적하고
+작은 요약 파일(result/{작품명}_summary.json)로 저장
+
+누적 항목 (감정 레이블별):
+- count      : 문장 수
+- mean       : 평균 점수
+- variance   : 분산 (Welford 온라인 알고리즘, 모분산)
+- max        : 최대 점수
+- top_labels : 각 문장에서 가장 높은 점수를 받은 레이블의 빈도
+
+요약 파일 형식:
+{
+  "play": "play1",
+  "labels": [...],
+  "play_stats": {count, mean: {레이블: 값}, variance: {...}, max: {...}, top_labels: {...}},
+  "speakers": {speaker: {같은 형식}, ...}
+}
+"""
+
+import json
+import os
+
+import numpy as np
+
+
+class EmotionAccumulator:
+    """count / 평균 / 분산 / 최대값 / top 레이블 빈도를 문장 하나씩 누적"""
+
+    def __init__(self, num_labels):
+        self.count = 0
+        self.mean = np.zeros(num_labels)
+        self.m2 = np.zeros(num_labels)
+        self.max = np.zeros(num_labels)
+        self.top_counts = np.zeros(num_labels, dtype=np.int64)
+
+    def update(self, scores):
+        """문장 하나의 점수 벡터(레이블 순서) 추가"""
+        x = np.asarray(scores, dtype=np.float64)
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        np.maximum(self.max, x, out=self.max)
+        self.top_counts[int(np.argmax(x))] += 1
+
+    def variance(self):
+        """모분산 (문장이 없으면 0)"""
+        if self.count == 0:
+            return np.zeros_like(self.m2)
+        return self.m2 / self.count
+
+    def to_dict(self, labels):
+        """JSON 저장용 딕셔너리 (레이블 이름 → 값)"""
+        def by_label(values):
+            return {label: round(float(v), 6) for label, v in zip(labels, values)}
+
+        top_labels = {
+            labels[idx]: int(self.top_counts[idx])
+            for idx in np.argsort(self.top_counts)[::-1]
+            if self.top_counts[idx] > 0
+        }
+        return {
+            "count": self.count,
+            "mean": by_label(self.mean),
+            "variance": by_label(self.variance()),
+            "max": by_label(self.max),
+            "top_labels": top_labels,
+        }
+
+
+class PlaySummary:
+    """작품 전체 + speaker 별 EmotionAccumulator 묶음"""
+
+    def __init__(self, play_name, labels):
+        self.play_name = play_name
+        self.labels = list(labels)
+        self.play = EmotionAccumulator(len(self.labels))
+        self.speakers = {}
+
+    def update(self, speaker, scores):
+        """speaker 의 문장 하나 점수 추가"""
+        if speaker not in self.speakers:
+            self.speakers[speaker] = EmotionAccumulator(len(self.labels))
+        self.speakers[speaker].update(scores)
+        self.play.update(scores)
+
+    def to_dict(self):
+        return {
+            "play": self.play_name,
+            "labels": self.labels,
+            "play_stats": self.play.to_dict(self.labels),
+            "speakers": {
+                speaker: acc.to_dict(self.labels)
+                for speaker, acc in sorted(self.speakers.items())
+            },
+        }
+
+
+def summary_path(result_path):
+    """result/{작품명}_result.json → result/{작품명}_summary.json"""
+    return result_path.replace("_result.json", "_summary.json")
+
+
+def save_summary(summary, output_path):
+    """요약 파일 저장"""
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(summary.to_dict(), f, ensure_ascii=False, indent=2)
+    print(f"요약 저장 완료: {output_path}")
+
+
+def load_summary(filepath):
+    """요약 파일 로드 (없으면 None)"""
+    if not os.path.exists(filepath):
+        return None
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def top_emotions(stats, k=3):
+    """통계 딕셔너리에서 평균 점수 상위 k개 (레이블, 평균) 리스트"""
+    return sorted(stats["mean"].items(), key=lambda x: x[1], reverse=True)[:k]
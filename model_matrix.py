@@ -0,0 +1,282 @@
+"""
+model_matrix.py
+여러 감정 분류 모델로 같은 작품들을 분석해서 결과를 나란히 비교
+
+- 토크나이저 정의가 같은 모델끼리는 토큰 저장소(pretokenize.py)를 공유 → 한 번만 토큰화
+  (저장소 키는 모델 이름이 아닌 토크나이저 정의 해시, timing.json 의 shared_tokenization_plays 로 확인)
+- 모델별 결과는 result/models/{모델}/ 에 캐시
+  (원본 / 토크나이저 / max_length 가 같으면 다시 분석하지 않음)
+- 작품별 비교 파일: result/{작품명}_matrix.json
+  기준 모델(MODEL_NAMES[0])의 레이블 순서에 맞춰 각 모델의 점수를 정렬 (LABEL_MAP 으로 레이블 이름 매핑)
+  기준 레이블에 없는 레이블은 뒤에 추가, 모델에 없는 레이블은 null
+- 모델별 시간 측정: result/models/{모델}/timing.json
+
+출력 형식 ({작품명}_matrix.json):
+{
+  "labels": [...],
+  "models": [...],
+  "sentences": {id: {speaker, sentence, scores: {모델: [레이블 순서 점수]}}}
+}
+"""
+
+import json
+import os
+import time
+
+import torch
+
+from analyze import (
+    MAX_LENGTH, PLAY_FILES,
+    analyze_emotions, create_worker_pool, load_labels, load_model_for_pool, load_parsed_json,
+    load_run_settings,
+    save_results,
+)
+from emotion_summary import load_summary, save_summary, summary_path
+from pretokenize import build_token_store, load_tokenizer, safe_name, tokenizer_key
+
+# ============== CONFIG ==============
+# 비교할 모델 목록 (첫 번째 모델의 레이블이 비교 기준)
+MODEL_NAMES = [
+    "SamLowe/roberta-base-go_emotions",
+    "j-hartmann/emotion-english-distilroberta-base",
+]
+
+# 모델 레이블 → 기준 레이블 이름 매핑 (없으면 소문자 이름 그대로 사용)
+# 예: {"some/model": {"happy": "joy", "angry": "anger"}}
+LABEL_MAP = {}
+
+# 모델별 결과 / 시간 측정 폴더
+MODELS_DIR = os.path.join("result", "models")
+# ====================================
+
+
+def model_dir(model_name):
+    """모델별 결과 폴더"""
+    return os.path.join(MODELS_DIR, safe_name(model_name))
+
+
+def cache_key(model_name, store, max_length=MAX_LENGTH):
+    """결과 캐시가 유효한지 판단하는 키 (모델 / 토크나이저 / 원본 / max_length)"""
+    return {
+        "model": model_name,
+        "tokenizer_key": store["meta"]["tokenizer_key"],
+        "source_sha1": store["meta"]["source_sha1"],
+        "max_length": max_length,
+    }
+
+
+def load_cached_results(result_path, key):
+    """
+    캐시 키가 같으면 저장된 결과 반환 (아니면 None)
+
+    Returns:
+        (results, 모델 레이블 순서) 또는 None
+    """
+    meta_path = result_path.replace(".json", ".meta.json")
+    summary = load_summary(summary_path(result_path))
+    if summary is None or not (os.path.exists(result_path) and os.path.exists(meta_path)):
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        if json.load(f) != key:
+            return None
+    return load_parsed_json(result_path), summary["labels"]
+
+
+def save_cache_key(result_path, key):
+    """결과 옆에 캐시 키 저장"""
+    meta_path = result_path.replace(".json", ".meta.json")
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(key, f, ensure_ascii=False, indent=2)
+
+
+def run_model(model_name, plays, tokenizers, stores):
+    """
+    모델 하나로 모든 작품 분석 (캐시가 있으면 재사용)
+
+    Args:
+        plays: [(작품명, 입력 경로), ...]
+        tokenizers: {토크나이저 정의 해시: tokenizer} - 모델 사이에서 공유
+        stores: {(토크나이저 정의 해시, 작품명): store} - 모델 사이에서 공유
+
+    Returns:
+        results_by_play: {작품명: (results, 모델 레이블 순서)}
+        timing: 시간 측정 딕셔너리
+    """
+    timing = {
+        "model": model_name,
+        "load_sec": 0.0,
+        "tokenize_sec": 0.0,
+        "inference_sec": 0.0,
+        "sentences": 0,
+        "cached_plays": [],
+        "shared_tokenization_plays": [],
+    }
+
+    start = time.perf_counter()
+    tokenizer = load_tokenizer(model_name)
+    key = tokenizer_key(tokenizer)
+    tokenizer = tokenizers.setdefault(key, tokenizer)
+    timing["tokenizer_key"] = key
+    if tokenizer.name_or_path != model_name:
+        # 앞선 모델과 토크나이저 정의가 같아서 그 토크나이저 / 저장소를 공유
+        timing["tokenizer_shared_with"] = tokenizer.name_or_path
+    timing["load_sec"] += time.perf_counter() - start
+
+    model = None
+    pool = None
+    settings = None
+    labels = None
+    results_by_play = {}
+    output_dir = model_dir(model_name)
+
+    try:
+        for play_name, input_path in plays:
+            # 토큰 저장소 (같은 토크나이저를 쓰는 앞선 모델이 이미 만들었으면 공유)
+            if (key, play_name) in stores:
+                timing["shared_tokenization_plays"].append(play_name)
+            else:
+                start = time.perf_counter()
+                stores[(key, play_name)] = build_token_store(input_path, tokenizer)
+                timing["tokenize_sec"] += time.perf_counter() - start
+            store = stores[(key, play_name)]
+
+            result_path = os.path.join(output_dir, f"{play_name}_result.json")
+            run_key = cache_key(model_name, store)
+            cached = load_cached_results(result_path, run_key)
+            if cached is not None:
+                print(f"[{model_name}] {play_name}: 캐시된 결과 사용")
+                timing["cached_plays"].append(play_name)
+                results_by_play[play_name] = cached
+                continue
+
+            # 분석이 필요할 때만 모델 로드 (워커 풀을 쓰면 각 워커에서만 로드)
+            if settings is None:
+                start = time.perf_counter()
+                settings = load_run_settings(model_name=model_name)
+                if settings["num_threads"]:
+                    torch.set_num_threads(settings["num_threads"])
+                labels = load_labels(model_name)
+                pool = create_worker_pool(model_name, settings["num_workers"], settings["num_threads"])
+                model = load_model_for_pool(model_name, pool)
+                timing["load_sec"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            data = load_parsed_json(input_path)
+            results, summary = analyze_emotions(
+                data, model, tokenizer, store, play_name, labels,
+                batch_size=settings["batch_size"], pool=pool,
+            )
+            timing["inference_sec"] += time.perf_counter() - start
+            timing["sentences"] += len(results)
+
+            save_results(results, result_path)
+            save_summary(summary, summary_path(result_path))
+            save_cache_key(result_path, run_key)
+            results_by_play[play_name] = (results, summary.labels)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    if timing["inference_sec"] > 0:
+        timing["sentences_per_sec"] = timing["sentences"] / timing["inference_sec"]
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "timing.json"), 'w', encoding='utf-8') as f:
+        json.dump(timing, f, ensure_ascii=False, indent=2)
+
+    return results_by_play, timing
+
+
+def align_label(model_name, label):
+    """모델 레이블 → 기준 레이블 이름"""
+    return LABEL_MAP.get(model_name, {}).get(label, label.lower())
+
+
+def build_matrix(data, runs):
+    """
+    작품 하나의 모델별 결과를 기준 레이블 순서로 정렬해서 나란히 합침
+
+    Args:
+        data: 파싱된 작품 {id: {speaker, sentence}}
+        runs: {모델: (results, 모델 레이블 순서)} (첫 번째 모델이 기준)
+    """
+    # 기준 모델 레이블 순서 + 다른 모델에만 있는 레이블
+    labels = []
+    for model_name, (_, model_labels) in runs.items():
+        for label in model_labels:
+            aligned = align_label(model_name, label)
+            if aligned not in labels:
+                labels.append(aligned)
+    label_index = {label: idx for idx, label in enumerate(labels)}
+
+    sentences = {}
+    for sentence_id, item in data.items():
+        scores = {}
+        for model_name, (results, _) in runs.items():
+            row = [None] * len(labels)
+            for emotion in results[sentence_id]["emotions"]:
+                row[label_index[align_label(model_name, emotion["label"])]] = emotion["score"]
+            scores[model_name] = row
+        sentences[sentence_id] = {
+            "speaker": item["speaker"],
+            "sentence": item["sentence"],
+            "scores": scores,
+        }
+
+    return {"labels": labels, "models": list(runs), "sentences": sentences}
+
+
+def print_timing_report(timings):
+    """모델별 시간 측정 요약 출력"""
+    print(f"\n{'='*50}")
+    print("모델별 시간 측정")
+    print(f"{'='*50}")
+    for timing in timings:
+        speed = timing.get("sentences_per_sec")
+        speed_text = f"{speed:.1f} 문장/초" if speed else "-"
+        print(f"{timing['model']}")
+        print(f"  로딩 {timing['load_sec']:.1f}s | 토큰화 {timing['tokenize_sec']:.1f}s | "
+              f"추론 {timing['inference_sec']:.1f}s ({timing['sentences']}문장, {speed_text})")
+        if timing["shared_tokenization_plays"]:
+            shared_with = timing.get("tokenizer_shared_with", "-")
+            print(f"  토큰화 공유 ({shared_with}): {', '.join(timing['shared_tokenization_plays'])}")
+        if timing["cached_plays"]:
+            print(f"  캐시 사용: {', '.join(timing['cached_plays'])}")
+
+
+def main():
+    plays = []
+    for filename in PLAY_FILES:
+        input_path = os.path.join("data", "parsed", filename)
+        if not os.path.exists(input_path):
+            print(f"파일 없음, 건너뜀: {input_path}")
+            continue
+        plays.append((os.path.splitext(filename)[0], input_path))
+
+    tokenizers = {}
+    stores = {}
+    results = {}
+    timings = []
+    for model_name in MODEL_NAMES:
+        print(f"\n{'='*50}")
+        print(f"모델: {model_name}")
+        print(f"{'='*50}")
+        results[model_name], timing = run_model(model_name, plays, tokenizers, stores)
+        timings.append(timing)
+
+    # 작품별 비교 파일 저장
+    for play_name, input_path in plays:
+        data = load_parsed_json(input_path)
+        matrix = build_matrix(data, {name: results[name][play_name] for name in MODEL_NAMES})
+        output_path = os.path.join("result", f"{play_name}_matrix.json")
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(matrix, f, ensure_ascii=False)
+        print(f"비교 결과 저장 완료: {output_path}")
+
+    print_timing_report(timings)
+    print("\n\n모든 모델 분석 완료!")
+
+
+if __name__ == "__main__":
+    main()
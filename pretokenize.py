@@ -0,0 +1,275 @@
+"""
+pretokenize.py
+파싱된 JSON(data/parsed/*.json)을 미리 토큰화해서 memory-mapped 토큰 ID 배열로 저장
+
+저장 형식 (data/tokenized/{토큰나이저 키}/):
+- {작품명}.ids.npy      : 모든 문장의 토큰 ID를 이어붙인 1차원 int32 배열 (special token 제외)
+- {작품명}.offsets.npy  : 문장 i의 토큰은 ids[offsets[i]:offsets[i+1]] (int64, 길이 N+1)
+- {작품명}.meta.json    : 문장 ID 순서, 원본 파일 해시, 문장별 해시, 토크나이저 정보
+
+토크나이저 키 = 토크나이저 정의(vocab/merges/정규화 규칙 등)의 해시 (이름은 meta.json 에만 기록)
+→ 이름이 다른 모델이라도 토크나이저 정의가 같으면 같은 저장소를 공유
+→ max_length 는 배치를 만들 때 적용하므로 max_length 가 달라도 다시 토큰화하지 않음
+
+원본 파일이 바뀌지 않았으면 아무것도 하지 않고,
+일부 문장만 바뀌었으면 바뀐 문장만 다시 토큰화
+"""
+
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+import transformers
+from transformers import AutoTokenizer
+
+# ============== CONFIG ==============
+# 토크나이저를 가져올 모델
+MODEL_NAME = "SamLowe/roberta-base-go_emotions"
+
+# 처리할 파일 목록
+PLAY_FILES = ["play1.json", "play2.json"]
+
+# 입력 / 출력 폴더
+PARSED_DIR = os.path.join("data", "parsed")
+TOKENIZED_DIR = os.path.join("data", "tokenized")
+
+# fast tokenizer 한 번 호출에 넣을 문장 수
+TOKENIZE_BATCH_SIZE = 1024
+# ====================================
+
+STORE_FORMAT_VERSION = 1
+
+
+def load_tokenizer(model_name=MODEL_NAME):
+    """fast tokenizer 로드 (배치 토큰화를 위해 fast 버전 필수)"""
+    tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+    if not tokenizer.is_fast:
+        raise ValueError(f"fast tokenizer 를 사용할 수 없는 모델입니다: {model_name}")
+    return tokenizer
+
+
+def safe_name(name):
+    """모델/토크나이저 이름 → 폴더 이름으로 쓸 수 있는 문자열"""
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+
+
+def tokenizer_key(tokenizer):
+    """
+    토크나이저 저장소 키 생성: 토크나이저 정의 해시 16자리
+    모델 이름은 포함하지 않으므로 정의가 같은 토크나이저끼리는 같은 키가 됨
+    truncation / padding 설정은 저장되는 토큰 ID 에 영향이 없으므로 해시에서 제외
+    """
+    definition = json.loads(tokenizer.backend_tokenizer.to_str())
+    definition.pop("truncation", None)
+    definition.pop("padding", None)
+    canonical = json.dumps(definition, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def file_sha1(filepath):
+    """파일 내용의 sha1 해시"""
+    h = hashlib.sha1()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def text_sha1(text):
+    """문장 하나의 sha1 해시"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def store_paths(store_dir, play_name):
+    """저장소 파일 경로 (ids, offsets, meta)"""
+    return (
+        os.path.join(store_dir, f"{play_name}.ids.npy"),
+        os.path.join(store_dir, f"{play_name}.offsets.npy"),
+        os.path.join(store_dir, f"{play_name}.meta.json"),
+    )
+
+
+def load_store_meta(store_dir, play_name):
+    """meta.json 로드 (없거나 형식이 다르면 None)"""
+    _, _, meta_path = store_paths(store_dir, play_name)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get("format_version") != STORE_FORMAT_VERSION:
+        return None
+    return meta
+
+
+def load_token_store(store_dir, play_name):
+    """
+    토큰 저장소를 memory-map 으로 열기
+
+    Returns:
+        store: {"ids": np.memmap, "offsets": np.ndarray, "sentence_ids": [...], "meta": {...},
+                "store_dir": ..., "play_name": ...}
+               저장소가 없으면 None
+               (store_dir, play_name 으로 다른 프로세스에서도 같은 저장소를 다시 열 수 있음)
+    """
+    meta = load_store_meta(store_dir, play_name)
+    if meta is None:
+        return None
+    ids_path, offsets_path, _ = store_paths(store_dir, play_name)
+    return {
+        "ids": np.load(ids_path, mmap_mode="r"),
+        "offsets": np.load(offsets_path),
+        "sentence_ids": meta["sentence_ids"],
+        "meta": meta,
+        "store_dir": store_dir,
+        "play_name": play_name,
+    }
+
+
+def tokenize_texts(texts, tokenizer, batch_size=TOKENIZE_BATCH_SIZE):
+    """fast tokenizer 배치 호출로 토큰화 (special token 없이, 잘라내지 않음)"""
+    token_lists = []
+    for start in range(0, len(texts), batch_size):
+        encoded = tokenizer(
+            texts[start:start + batch_size],
+            add_special_tokens=False,
+            truncation=False,
+            return_attention_mask=False,
+        )
+        token_lists.extend(encoded["input_ids"])
+    return token_lists
+
+
+def build_token_store(input_path, tokenizer, tokenized_dir=TOKENIZED_DIR):
+    """
+    파싱된 JSON 하나를 토큰 저장소로 변환 (이미 최신이면 그대로 반환)
+
+    Returns:
+        load_token_store() 와 같은 store 딕셔너리
+    """
+    play_name = os.path.splitext(os.path.basename(input_path))[0]
+    key = tokenizer_key(tokenizer)
+    store_dir = os.path.join(tokenized_dir, key)
+    source_hash = file_sha1(input_path)
+
+    # 원본이 그대로면 토큰화 생략
+    previous = load_token_store(store_dir, play_name)
+    if previous is not None and previous["meta"]["source_sha1"] == source_hash:
+        print(f"[{play_name}] 토큰 저장소 최신 상태, 재사용: {store_dir}")
+        return previous
+
+    with open(input_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    sentence_ids = list(data.keys())
+    sentences = [data[sid]["sentence"] for sid in sentence_ids]
+    hashes = [text_sha1(s) for s in sentences]
+
+    # 이전 저장소에서 내용이 같은 문장의 토큰은 그대로 재사용
+    reusable = {}
+    if previous is not None:
+        prev_ids = previous["ids"]
+        prev_offsets = previous["offsets"]
+        for i, h in enumerate(previous["meta"]["sentence_sha1"]):
+            reusable[h] = np.array(prev_ids[prev_offsets[i]:prev_offsets[i + 1]])
+
+    todo = [i for i, h in enumerate(hashes) if h not in reusable]
+    print(f"[{play_name}] 토큰화: 신규 {len(todo)}개 / 재사용 {len(sentences) - len(todo)}개")
+    fresh = tokenize_texts([sentences[i] for i in todo], tokenizer)
+    fresh_by_index = dict(zip(todo, fresh))
+
+    lengths = np.zeros(len(sentences), dtype=np.int64)
+    pieces = []
+    for i, h in enumerate(hashes):
+        if i in fresh_by_index:
+            piece = np.asarray(fresh_by_index[i], dtype=np.int32)
+        else:
+            piece = reusable[h].astype(np.int32, copy=False)
+        pieces.append(piece)
+        lengths[i] = len(piece)
+
+    offsets = np.zeros(len(sentences) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    ids = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.int32)
+
+    # 이전 저장소 참조 해제
+    previous = None
+    reusable = None
+
+    # 다른 프로세스(워커 풀, 동시에 실행 중인 preview.py 등)가 기존 파일을 memory-map 하고 있을 수 있으므로
+    # 같은 파일을 덮어쓰지 않고 임시 파일에 쓴 뒤 os.replace 로 교체 (기존 mmap 은 이전 내용을 계속 읽음)
+    os.makedirs(store_dir, exist_ok=True)
+    ids_path, offsets_path, meta_path = store_paths(store_dir, play_name)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    for path, array in ((ids_path, ids), (offsets_path, offsets)):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+    meta = {
+        "format_version": STORE_FORMAT_VERSION,
+        "tokenizer_name": tokenizer.name_or_path,
+        "tokenizer_key": key,
+        "transformers_version": transformers.__version__,
+        "source_path": input_path,
+        "source_sha1": source_hash,
+        "sentence_ids": sentence_ids,
+        "sentence_sha1": hashes,
+        "num_tokens": int(offsets[-1]),
+    }
+    # meta 는 마지막에 저장 → meta 가 있으면 ids/offsets 도 완성된 상태 (meta 도 임시 파일 후 교체)
+    tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, meta_path)
+
+    print(f"[{play_name}] 토큰 저장소 저장 완료: {store_dir} (토큰 {meta['num_tokens']}개)")
+    return load_token_store(store_dir, play_name)
+
+
+def build_padded_batch(store, indices, tokenizer, max_length):
+    """
+    저장소 슬라이스에서 padding 된 배치 생성
+    각 문장은 max_length 에 맞게 잘라낸 뒤 special token(<s> ... </s>)을 붙임
+
+    Returns:
+        input_ids, attention_mask: (len(indices), 배치 내 최대 길이) int64 배열
+    """
+    ids = store["ids"]
+    offsets = store["offsets"]
+    budget = max_length - tokenizer.num_special_tokens_to_add(pair=False)
+
+    rows = []
+    for i in indices:
+        body = ids[offsets[i]:min(offsets[i + 1], offsets[i] + budget)].tolist()
+        rows.append(tokenizer.build_inputs_with_special_tokens(body))
+
+    width = max(len(row) for row in rows)
+    input_ids = np.full((len(rows), width), tokenizer.pad_token_id, dtype=np.int64)
+    attention_mask = np.zeros((len(rows), width), dtype=np.int64)
+    for r, row in enumerate(rows):
+        input_ids[r, :len(row)] = row
+        attention_mask[r, :len(row)] = 1
+    return input_ids, attention_mask
+
+
+def main():
+    print("토크나이저 로딩 중...")
+    tokenizer = load_tokenizer(MODEL_NAME)
+    print(f"토크나이저 키: {tokenizer_key(tokenizer)}\n")
+
+    for filename in PLAY_FILES:
+        input_path = os.path.join(PARSED_DIR, filename)
+
+        if not os.path.exists(input_path):
+            print(f"파일 없음, 건너뜀: {input_path}")
+            continue
+
+        build_token_store(input_path, tokenizer)
+
+    print("\n\n모든 작품 토큰화 완료!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+preview.py
+전체 분석 전에 speaker 별 감정 분포를 빠르게 미리 보기
+
+- speaker 별로 문장을 무작위 추출(층화 추출)해서 전체 모델로 분석
+- speaker 별 평균 감정 벡터와 bootstrap 신뢰구간 추정
+- 모든 speaker 의 신뢰구간 폭이 TARGET_CI_WIDTH 이하가 되거나
+  TIME_BUDGET_SEC 이 지날 때까지 라운드마다 표본을 늘려감
+- 분석한 문장 점수는 result/{작품명}_score_cache.json 에 저장
+  → 나중에 analyze.py 로 전체 분석할 때 다시 분석하지 않음
+  → preview 를 다시 실행해도 이전 표본부터 이어서 진행
+
+출력: result/{작품명}_preview.json
+"""
+
+import json
+import os
+import random
+import time
+
+import numpy as np
+import torch
+
+from analyze import (
+    MODEL_NAME, PLAY_FILES,
+    create_worker_pool, load_labels, load_model_for_pool, load_parsed_json, load_run_settings,
+    load_score_cache, save_score_cache, score_cache_path, score_sentences,
+)
+from pretokenize import build_token_store, load_tokenizer
+
+# ============== CONFIG ==============
+# 첫 라운드에서 speaker 마다 분석할 문장 수 (이보다 적게 분석된 speaker 는 수렴으로 보지 않음)
+INITIAL_PER_SPEAKER = 8
+
+# 이후 라운드마다 수렴하지 않은 speaker 에 추가할 문장 수
+ROUND_PER_SPEAKER = 8
+
+# 목표 신뢰구간 폭 (모든 감정 레이블의 (상한 - 하한) 중 최대값 기준)
+TARGET_CI_WIDTH = 0.05
+CONFIDENCE = 0.95
+BOOTSTRAP_SAMPLES = 1000
+
+# 작품 하나당 시간 제한 (초)
+TIME_BUDGET_SEC = 60
+
+SEED = 0
+# ====================================
+
+
+def bootstrap_ci(rows, rng, num_samples=BOOTSTRAP_SAMPLES, confidence=CONFIDENCE):
+    """
+    평균 벡터의 bootstrap 신뢰구간
+    재표본을 직접 만드는 대신 multinomial 가중치로 계산 (메모리: num_samples × 문장 수)
+
+    Returns:
+        lower, upper: 레이블별 하한 / 상한
+    """
+    n = len(rows)
+    weights = rng.multinomial(n, np.full(n, 1.0 / n), size=num_samples) / n
+    means = weights @ rows
+    alpha = (1 - confidence) / 2
+    lower, upper = np.quantile(means, [alpha, 1 - alpha], axis=0)
+    return lower, upper
+
+
+def estimate_speaker(rows, total, rng):
+    """
+    speaker 하나의 평균 감정 벡터와 신뢰구간
+    모든 문장을 분석했으면 정확한 값 (구간 폭 0)
+    """
+    mean = rows.mean(axis=0)
+    exact = len(rows) == total
+    if exact:
+        lower, upper = mean, mean
+    else:
+        lower, upper = bootstrap_ci(rows, rng)
+    return {
+        "scored": len(rows),
+        "total": total,
+        "exact": exact,
+        "mean": mean,
+        "lower": lower,
+        "upper": upper,
+        "max_width": float(np.max(upper - lower)),
+    }
+
+
+def is_converged(estimate):
+    """목표 폭에 도달했는지 (표본이 너무 적으면 bootstrap 구간을 믿지 않음)"""
+    if estimate is None:
+        return False
+    if estimate["exact"]:
+        return True
+    return estimate["scored"] >= INITIAL_PER_SPEAKER and estimate["max_width"] <= TARGET_CI_WIDTH
+
+
+def preview_play(data, model, tokenizer, store, play_name, labels, output_path, settings, pool=None):
+    """
+    작품 하나 미리 보기: 수렴하거나 시간이 다 될 때까지 라운드 반복
+
+    Returns:
+        {speaker: estimate}, 수렴 여부, 경과 시간
+    """
+    start = time.perf_counter()
+    rng = np.random.default_rng(SEED)
+    sentence_ids = store["sentence_ids"]
+    cache_path = score_cache_path(output_path)
+
+    # 이전 preview / 분석에서 이미 점수가 있는 문장은 그대로 사용
+    scored = load_score_cache(cache_path, store)
+    if scored:
+        print(f"[{play_name}] 캐시된 점수 {len(scored)}개 재사용")
+
+    # speaker 별 남은 문장 (무작위 순서)
+    by_speaker = {}
+    for i, sentence_id in enumerate(sentence_ids):
+        by_speaker.setdefault(data[sentence_id]["speaker"], []).append(i)
+    shuffler = random.Random(SEED)
+    remaining = {}
+    for speaker, indices in by_speaker.items():
+        pending = [i for i in indices if i not in scored]
+        shuffler.shuffle(pending)
+        remaining[speaker] = pending
+
+    round_num = 0
+    while True:
+        estimates = {}
+        for speaker, indices in by_speaker.items():
+            rows = [scored[i] for i in indices if i in scored]
+            estimates[speaker] = estimate_speaker(np.array(rows), len(indices), rng) if rows else None
+
+        unconverged = [s for s in by_speaker if not is_converged(estimates[s]) and remaining[s]]
+        elapsed = time.perf_counter() - start
+        if not unconverged or elapsed >= TIME_BUDGET_SEC:
+            break
+
+        # 수렴하지 않은 speaker 마다 표본 추가 (한 번에 묶어서 배치 분석)
+        round_num += 1
+        picks = []
+        for speaker in unconverged:
+            already = len(by_speaker[speaker]) - len(remaining[speaker])
+            k = INITIAL_PER_SPEAKER if already < INITIAL_PER_SPEAKER else ROUND_PER_SPEAKER
+            picks.extend(remaining[speaker][:k])
+            remaining[speaker] = remaining[speaker][k:]
+
+        print(f"[{play_name}] 라운드 {round_num}: speaker {len(unconverged)}명, 문장 {len(picks)}개 추가 분석")
+        scored.update(score_sentences(
+            model, tokenizer, store, picks, play_name,
+            batch_size=settings["batch_size"], pool=pool, verbose=False,
+        ))
+        save_score_cache(cache_path, store, scored, labels)
+
+    converged = all(is_converged(e) for e in estimates.values())
+    return estimates, converged, elapsed
+
+
+def save_preview(estimates, labels, play_name, converged, elapsed, output_path):
+    """preview 결과 저장"""
+    def by_label(values):
+        return {label: round(float(v), 6) for label, v in zip(labels, values)}
+
+    speakers = {}
+    for speaker, e in sorted(estimates.items()):
+        if e is None:
+            continue
+        speakers[speaker] = {
+            "scored": e["scored"],
+            "total": e["total"],
+            "exact": e["exact"],
+            "max_ci_width": round(e["max_width"], 6),
+            "mean": by_label(e["mean"]),
+            "lower": by_label(e["lower"]),
+            "upper": by_label(e["upper"]),
+        }
+
+    preview = {
+        "play": play_name,
+        "labels": labels,
+        "target_ci_width": TARGET_CI_WIDTH,
+        "confidence": CONFIDENCE,
+        "converged": converged,
+        "elapsed_sec": round(elapsed, 2),
+        "speakers": speakers,
+    }
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(preview, f, ensure_ascii=False, indent=2)
+    print(f"preview 저장 완료: {output_path}")
+
+
+def print_preview(estimates, labels, play_name, converged, elapsed):
+    """speaker 별 평균 상위 3개 감정과 신뢰구간 출력"""
+    status = "목표 폭 도달" if converged else "시간 제한 / 표본 소진으로 중단"
+    print(f"\n=== [{play_name}] preview ({status}, {elapsed:.1f}초) ===")
+    for speaker, e in sorted(estimates.items()):
+        if e is None:
+            continue
+        top = np.argsort(e["mean"])[::-1][:3]
+        parts = [f"{labels[i]} {e['mean'][i]:.3f} [{e['lower'][i]:.3f}, {e['upper'][i]:.3f}]" for i in top]
+        print(f"{speaker}: {e['scored']}/{e['total']}문장, 최대 구간 폭 {e['max_width']:.3f} | {', '.join(parts)}")
+
+
+def main():
+    settings = load_run_settings()
+    if settings["num_threads"]:
+        torch.set_num_threads(settings["num_threads"])
+
+    # 워커 풀을 쓰면 모델은 각 워커에서만 로드
+    print("모델 로딩 중...")
+    tokenizer = load_tokenizer(MODEL_NAME)
+    labels = load_labels(MODEL_NAME)
+    pool = create_worker_pool(MODEL_NAME, settings["num_workers"], settings["num_threads"])
+    model = load_model_for_pool(MODEL_NAME, pool)
+    print("모델 로딩 완료!\n")
+
+    try:
+        for filename in PLAY_FILES:
+            input_path = os.path.join("data", "parsed", filename)
+
+            if not os.path.exists(input_path):
+                print(f"파일 없음, 건너뜀: {input_path}")
+                continue
+
+            play_name = os.path.splitext(filename)[0]
+            print(f"\n{'='*50}")
+            print(f"preview: {play_name}")
+            print(f"{'='*50}")
+
+            # analyze.py 와 같은 경로 기준 (점수 캐시 공유)
+            output_path = os.path.join("result", f"{play_name}_result.json")
+
+            data = load_parsed_json(input_path)
+            store = build_token_store(input_path, tokenizer)
+            estimates, converged, elapsed = preview_play(
+                data, model, tokenizer, store, play_name, labels, output_path, settings, pool,
+            )
+            print_preview(estimates, labels, play_name, converged, elapsed)
+            save_preview(estimates, labels, play_name, converged, elapsed,
+                         output_path.replace("_result.json", "_preview.json"))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    print("\n\n모든 작품 preview 완료!")
+
+
+if __name__ == "__main__":
+    main()
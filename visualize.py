@@ -11,6 +11,8 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from emotion_summary import load_summary, summary_path, top_emotions
+
 # ============== CONFIG ==============
 # 처리할 작품 목록
 PLAY_FILES = ["play1_result.json", "play2_result.json"]
@@ -145,6 +147,9 @@ def main():
         print(f"로딩: {result_path}")
         result_data = load_result_json(result_path)
         
+        # analyze.py 가 함께 저장한 요약 파일 (있으면 상위 감정 통계에 사용)
+        summary = load_summary(summary_path(result_path))
+
         # speaker별로 분리
         speaker_data = split_by_speaker(result_data)
         print(f"발견된 speaker: {len(speaker_data)}명\n")
@@ -172,11 +177,14 @@ def main():
             output_path = os.path.join(output_dir, f"{safe_speaker}_heatmap.png")
             visualize_heatmap(heatmap_matrix, sentence_ids, title, output_path)
             
-            # 감정 통계 출력 (평균)
-            avg_scores = np.mean(heatmap_matrix, axis=1)
-            top_indices = np.argsort(avg_scores)[::-1][:3]
-            top_emotions = [f"{EMOTION_LABELS[idx]}({avg_scores[idx]:.3f})" for idx in top_indices]
-            print(f"  상위 감정: {', '.join(top_emotions)}")
+            # 감정 통계 출력 (평균) - 요약 파일이 있으면 그대로 사용
+            if summary is not None and speaker in summary["speakers"]:
+                top = top_emotions(summary["speakers"][speaker])
+            else:
+                avg_scores = np.mean(heatmap_matrix, axis=1)
+                top_indices = np.argsort(avg_scores)[::-1][:3]
+                top = [(EMOTION_LABELS[idx], avg_scores[idx]) for idx in top_indices]
+            print(f"  상위 감정: {', '.join(f'{label}({score:.3f})' for label, score in top)}")
             print()
         
         print(f"히트맵이 '{output_dir}' 폴더에 저장되었습니다.")
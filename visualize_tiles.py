@@ -0,0 +1,436 @@
+"""
+visualize_tiles.py
+긴 작품을 확대/축소하며 볼 수 있도록 감정 히트맵을 다중 해상도 타일로 저장
+
+- (28 × N) 감정 행렬을 2의 거듭제곱 단위로 열을 묶어서 level 0 (문장 1개) ~ level L 피라미드 생성
+- 각 level 은 mean / max 두 가지 집계를 가짐
+- 각 level 을 TILE_WIDTH 열씩 잘라 타일 파일(.js)로 저장 (점수는 0~255 로 양자화)
+- 정적 HTML 뷰어(index.html)는 현재 화면에 보이는 타일만 불러옴
+  (타일을 <script> 로 불러오므로 서버 없이 file:// 로 열어도 동작)
+
+출력 구조:
+visualize/{작품명}/tiles/
+├── index.html          # 뷰어
+├── manifest.js         # 감정 레이블, speaker 목록(폴더 → 이름), level 수
+├── all/{level}/{tile}.js   # 작품 전체
+└── s_{n}/{level}/{tile}.js # n 번째 speaker (이름은 manifest 에만 기록)
+"""
+
+import base64
+import json
+import os
+import shutil
+
+import numpy as np
+
+from visualize import EMOTION_LABELS, create_heatmap_data, load_result_json, split_by_speaker
+
+# ============== CONFIG ==============
+# 처리할 작품 목록
+PLAY_FILES = ["play1_result.json", "play2_result.json"]
+
+# 출력 폴더 (visualize/{작품명}/tiles/)
+OUTPUT_BASE_DIR = "visualize"
+
+# 타일 하나의 열 수
+TILE_WIDTH = 256
+
+# 뷰어 기본 색상 범위 상한 (visualize.py 히트맵과 동일)
+DEFAULT_VMAX = 0.3
+
+# 작품 전체(모든 speaker)를 나타내는 항목 이름
+ALL_SPEAKERS = "ALL"
+# ====================================
+
+
+def build_pyramid(matrix, tile_width=TILE_WIDTH):
+    """
+    (28, N) 행렬 → level 별 (mean, max) 리스트
+    level k 의 열 하나는 원래 문장 2^k 개 (마지막 열은 남은 문장만)
+    열 수가 tile_width 이하가 되는 level 까지 생성
+    """
+    sums = matrix.astype(np.float64)
+    counts = np.ones(matrix.shape[1])
+    maxes = matrix
+    levels = [(matrix, matrix)]
+
+    while sums.shape[1] > tile_width:
+        if sums.shape[1] % 2 == 1:
+            # 홀수 열이면 빈 열을 하나 덧붙여서 짝을 맞춤 (count 0 이라 평균에 영향 없음)
+            sums = np.pad(sums, ((0, 0), (0, 1)))
+            counts = np.pad(counts, (0, 1))
+            maxes = np.pad(maxes, ((0, 0), (0, 1)))
+        sums = sums[:, 0::2] + sums[:, 1::2]
+        counts = counts[0::2] + counts[1::2]
+        maxes = np.maximum(maxes[:, 0::2], maxes[:, 1::2])
+        levels.append((sums / counts, maxes))
+
+    return levels
+
+
+def quantize(block):
+    """0~1 점수 → 0~255 uint8 을 행 우선으로 이어붙인 base64 문자열"""
+    q = np.clip(np.rint(block * 255), 0, 255).astype(np.uint8)
+    return base64.b64encode(np.ascontiguousarray(q).tobytes()).decode("ascii")
+
+
+def write_tiles(levels, sentence_ids, speaker_dir, output_dir, tile_width=TILE_WIDTH):
+    """피라미드를 타일 파일로 저장 (level 0 타일에는 문장 ID 포함)"""
+    for level, (means, maxes) in enumerate(levels):
+        level_dir = os.path.join(output_dir, speaker_dir, str(level))
+        os.makedirs(level_dir, exist_ok=True)
+
+        num_cols = means.shape[1]
+        for tile, start in enumerate(range(0, num_cols, tile_width)):
+            end = min(start + tile_width, num_cols)
+            payload = {
+                "speaker": speaker_dir,
+                "level": level,
+                "tile": tile,
+                "width": end - start,
+                "mean": quantize(means[:, start:end]),
+                "max": quantize(maxes[:, start:end]),
+            }
+            if level == 0:
+                payload["ids"] = sentence_ids[start:end]
+
+            tile_path = os.path.join(level_dir, f"{tile}.js")
+            with open(tile_path, 'w', encoding='utf-8') as f:
+                f.write(f"window.heatmapTile({json.dumps(payload, ensure_ascii=False)});\n")
+
+
+def build_play_tiles(result_data, output_dir):
+    """
+    작품 하나의 전체 + speaker 별 타일과 manifest 생성
+
+    Returns:
+        뷰어를 만들었는지 (분석 결과가 비어 있으면 False)
+    """
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+
+    # 작품 전체를 첫 항목으로, 이후 speaker 이름 순
+    groups = [(ALL_SPEAKERS, result_data)] + sorted(split_by_speaker(result_data).items())
+
+    # 폴더 이름은 순번으로 정함 → "LADY M" / "LADY_M" 처럼 이름을 바꿔 쓰면 겹치는 speaker 도 구분
+    speakers = {}
+    order = []
+    for n, (speaker, data) in enumerate(groups):
+        if not data:
+            continue
+
+        speaker_dir = "all" if n == 0 else f"s_{n}"
+
+        heatmap_matrix, sentence_ids = create_heatmap_data(data)
+        levels = build_pyramid(heatmap_matrix.astype(np.float32))
+        write_tiles(levels, sentence_ids, speaker_dir, output_dir)
+
+        speakers[speaker_dir] = {
+            "name": speaker,
+            "n": len(sentence_ids),
+            "levels": len(levels),
+        }
+        order.append(speaker_dir)
+        print(f"  {speaker}: 문장 {len(sentence_ids)}개, level {len(levels)}개")
+
+    if not order:
+        print("  분석 결과가 없어 타일 뷰어를 만들지 않음")
+        return False
+
+    manifest = {
+        "labels": EMOTION_LABELS,
+        "tile_width": TILE_WIDTH,
+        "vmax": DEFAULT_VMAX,
+        "speakers": speakers,
+        "order": order,
+    }
+    with open(os.path.join(output_dir, "manifest.js"), 'w', encoding='utf-8') as f:
+        f.write(f"window.heatmapManifest = {json.dumps(manifest, ensure_ascii=False)};\n")
+
+    with open(os.path.join(output_dir, "index.html"), 'w', encoding='utf-8') as f:
+        f.write(VIEWER_HTML)
+    return True
+
+
+def main():
+    # play1, play2 순차 처리
+    for filename in PLAY_FILES:
+        result_path = os.path.join("result", filename)
+
+        if not os.path.exists(result_path):
+            print(f"파일 없음, 건너뜀: {result_path}")
+            continue
+
+        play_name = filename.replace("_result.json", "")
+
+        print(f"\n{'='*50}")
+        print(f"작품: {play_name}")
+        print(f"{'='*50}")
+
+        print(f"로딩: {result_path}")
+        result_data = load_result_json(result_path)
+
+        output_dir = os.path.join(OUTPUT_BASE_DIR, play_name, "tiles")
+        if build_play_tiles(result_data, output_dir):
+            print(f"타일 뷰어 저장 완료: {os.path.join(output_dir, 'index.html')}")
+
+    print("\n\n모든 작품 타일 생성 완료!")
+
+
+# 정적 뷰어: manifest.js 를 읽고, 보이는 범위에 해당하는 level/타일만 <script> 로 불러옴
+VIEWER_HTML = """<!DOCTYPE html>
+<html lang="ko">
+<head>
+<meta charset="utf-8">
+<title>Emotion Heatmap Viewer</title>
+<style>
+  body { font-family: sans-serif; margin: 12px; }
+  #controls > * { margin-right: 8px; }
+  #view { border: 1px solid #ccc; cursor: grab; margin-top: 8px; }
+  #info { font-size: 12px; color: #444; min-height: 16px; margin-top: 4px; }
+</style>
+</head>
+<body>
+<div id="controls">
+  <select id="speaker"></select>
+  <select id="agg">
+    <option value="mean">mean</option>
+    <option value="max">max</option>
+  </select>
+  <label>vmax <input id="vmax" type="number" step="0.05" min="0.01" max="1" style="width: 60px"></label>
+  <button id="reset">전체 보기</button>
+</div>
+<canvas id="view" width="1200" height="560"></canvas>
+<div id="info"></div>
+<script src="manifest.js"></script>
+<script>
+(function () {
+  var M = window.heatmapManifest;
+  var LABEL_W = 110, AXIS_H = 24, MIN_SPAN = 16, MAX_TILES = 512;
+  var STOPS = [[255,255,204],[255,237,160],[254,217,118],[254,178,76],[253,141,60],
+               [252,78,42],[227,26,28],[189,0,38],[128,0,38]];  // YlOrRd
+
+  var canvas = document.getElementById("view");
+  var ctx = canvas.getContext("2d");
+  var plotW = canvas.width - LABEL_W, plotH = canvas.height - AXIS_H;
+  var rowH = plotH / M.labels.length;
+  var speakerSel = document.getElementById("speaker");
+  var aggSel = document.getElementById("agg");
+  var vmaxInput = document.getElementById("vmax");
+  var info = document.getElementById("info");
+
+  if (!M.order.length) {
+    info.textContent = "표시할 문장이 없습니다.";
+    return;
+  }
+
+  var tiles = {};    // "speaker/level/tile" -> {mean, max, width, ids}
+  var pending = {};  // 불러오는 중인 타일
+  var view = {speaker: M.order[0], start: 0, end: 1};  // 보이는 범위 [start, end), 문장 단위
+
+  vmaxInput.value = M.vmax;
+  M.order.forEach(function (dir) {
+    var opt = document.createElement("option");
+    opt.value = dir;
+    opt.textContent = M.speakers[dir].name + " (" + M.speakers[dir].n + ")";
+    speakerSel.appendChild(opt);
+  });
+
+  function color(v) {
+    var x = Math.max(0, Math.min(1, v)) * (STOPS.length - 1);
+    var i = Math.min(STOPS.length - 2, Math.floor(x)), t = x - i;
+    var a = STOPS[i], b = STOPS[i + 1];
+    return [a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t, a[2] + (b[2] - a[2]) * t];
+  }
+
+  function decode(b64) {
+    var s = atob(b64), out = new Uint8Array(s.length);
+    for (var i = 0; i < s.length; i++) out[i] = s.charCodeAt(i);
+    return out;
+  }
+
+  window.heatmapTile = function (t) {
+    var key = t.speaker + "/" + t.level + "/" + t.tile;
+    tiles[key] = {mean: decode(t.mean), max: decode(t.max), width: t.width, ids: t.ids || null};
+    delete pending[key];
+    // 오래된 타일부터 정리
+    var keys = Object.keys(tiles);
+    for (var i = 0; i < keys.length - MAX_TILES; i++) delete tiles[keys[i]];
+    scheduleDraw();
+  };
+
+  function requestTile(key) {
+    if (pending[key]) return;
+    pending[key] = true;
+    var el = document.createElement("script");
+    el.src = key + ".js";
+    el.onload = function () { document.head.removeChild(el); };
+    // 실패한 타일은 pending 에서 지워서 다음 draw 에서 다시 요청
+    el.onerror = function () { delete pending[key]; document.head.removeChild(el); };
+    document.head.appendChild(el);
+  }
+
+  function speaker() { return M.speakers[view.speaker]; }
+
+  function chooseLevel() {
+    var perPixel = (view.end - view.start) / plotW;
+    var level = Math.floor(Math.log2(Math.max(1, perPixel)));
+    return Math.max(0, Math.min(speaker().levels - 1, level));
+  }
+
+  function clampView() {
+    var n = speaker().n;
+    var span = Math.max(Math.min(MIN_SPAN, n), Math.min(n, view.end - view.start));
+    var start = Math.max(0, Math.min(n - span, view.start));
+    view.start = start;
+    view.end = start + span;
+  }
+
+  // level 의 (col, row) 값 (타일이 아직 없으면 null)
+  function cell(level, col, row, agg) {
+    var t = Math.floor(col / M.tile_width);
+    var tile = tiles[view.speaker + "/" + level + "/" + t];
+    if (!tile) return null;
+    return tile[agg][row * tile.width + (col - t * M.tile_width)] / 255;
+  }
+
+  var drawQueued = false;
+  function scheduleDraw() {
+    if (drawQueued) return;
+    drawQueued = true;
+    window.requestAnimationFrame(function () { drawQueued = false; draw(); });
+  }
+
+  function draw() {
+    var level = chooseLevel(), bin = Math.pow(2, level);
+    var agg = aggSel.value;
+    var vmax = parseFloat(vmaxInput.value) || M.vmax;
+    var nLabels = M.labels.length;
+    var levelCols = Math.ceil(speaker().n / bin);
+    var c0 = Math.max(0, Math.floor(view.start / bin));
+    var c1 = Math.min(levelCols, Math.ceil(view.end / bin));
+    var width = Math.max(1, c1 - c0);
+
+    // 필요한 타일 요청
+    var t0 = Math.floor(c0 / M.tile_width), t1 = Math.floor((c1 - 1) / M.tile_width);
+    for (var t = t0; t <= t1; t++) {
+      var key = view.speaker + "/" + level + "/" + t;
+      if (!tiles[key]) requestTile(key);
+    }
+
+    var off = document.createElement("canvas");
+    off.width = width;
+    off.height = nLabels;
+    var octx = off.getContext("2d");
+    var img = octx.createImageData(width, nLabels);
+    for (var c = c0; c < c1; c++) {
+      for (var r = 0; r < nLabels; r++) {
+        var v = cell(level, c, r, agg);
+        var rgb = v === null ? [235, 235, 235] : color(v / vmax);
+        var p = (r * width + (c - c0)) * 4;
+        img.data[p] = rgb[0]; img.data[p + 1] = rgb[1]; img.data[p + 2] = rgb[2]; img.data[p + 3] = 255;
+      }
+    }
+    octx.putImageData(img, 0, 0);
+
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    var span = view.end - view.start;
+    var x0 = LABEL_W + (c0 * bin - view.start) / span * plotW;
+    var w = width * bin / span * plotW;
+    ctx.save();
+    ctx.beginPath();
+    ctx.rect(LABEL_W, 0, plotW, plotH);
+    ctx.clip();
+    ctx.imageSmoothingEnabled = false;
+    ctx.drawImage(off, x0, 0, w, plotH);
+    ctx.restore();
+
+    ctx.fillStyle = "#000";
+    ctx.font = "11px sans-serif";
+    ctx.textAlign = "right";
+    ctx.textBaseline = "middle";
+    M.labels.forEach(function (label, r) {
+      ctx.fillText(label, LABEL_W - 6, (r + 0.5) * rowH);
+    });
+    ctx.textAlign = "left";
+    ctx.textBaseline = "top";
+    ctx.fillText(Math.floor(view.start) + 1, LABEL_W, plotH + 6);
+    ctx.textAlign = "right";
+    ctx.fillText(Math.ceil(view.end), LABEL_W + plotW, plotH + 6);
+    ctx.textAlign = "center";
+    ctx.fillText("level " + level + " (" + bin + "문장/열, " + agg + ")", LABEL_W + plotW / 2, plotH + 6);
+  }
+
+  function colAt(x) {
+    return view.start + (x - LABEL_W) / plotW * (view.end - view.start);
+  }
+
+  canvas.addEventListener("wheel", function (e) {
+    e.preventDefault();
+    var x = e.offsetX;
+    if (x < LABEL_W) return;
+    var center = colAt(x);
+    var factor = Math.exp(e.deltaY * 0.002);
+    view.start = center - (center - view.start) * factor;
+    view.end = center + (view.end - center) * factor;
+    clampView();
+    scheduleDraw();
+  }, {passive: false});
+
+  var drag = null;
+  canvas.addEventListener("mousedown", function (e) {
+    drag = {x: e.clientX, start: view.start, end: view.end};
+    canvas.style.cursor = "grabbing";
+  });
+  window.addEventListener("mouseup", function () {
+    drag = null;
+    canvas.style.cursor = "grab";
+  });
+  window.addEventListener("mousemove", function (e) {
+    if (!drag) return;
+    var shift = (drag.x - e.clientX) / plotW * (drag.end - drag.start);
+    view.start = drag.start + shift;
+    view.end = drag.end + shift;
+    clampView();
+    scheduleDraw();
+  });
+
+  canvas.addEventListener("mousemove", function (e) {
+    var x = e.offsetX, y = e.offsetY;
+    if (x < LABEL_W || y >= plotH) { info.textContent = ""; return; }
+    var level = chooseLevel(), bin = Math.pow(2, level);
+    var col = Math.floor(colAt(x) / bin), row = Math.floor(y / rowH);
+    var v = cell(level, col, row, aggSel.value);
+    var first = col * bin + 1, last = Math.min(speaker().n, (col + 1) * bin);
+    var where = first === last ? first + "번째 문장" : first + "~" + last + "번째 문장";
+    if (level === 0) {
+      var t = Math.floor(col / M.tile_width);
+      var tile = tiles[view.speaker + "/0/" + t];
+      if (tile && tile.ids) where += " (ID " + tile.ids[col - t * M.tile_width] + ")";
+    }
+    info.textContent = where + " | " + M.labels[row] + ": " + (v === null ? "로딩 중" : v.toFixed(3));
+  });
+
+  function reset() {
+    view.start = 0;
+    view.end = speaker().n;
+    clampView();
+    scheduleDraw();
+  }
+
+  speakerSel.addEventListener("change", function () { view.speaker = speakerSel.value; reset(); });
+  aggSel.addEventListener("change", scheduleDraw);
+  vmaxInput.addEventListener("change", scheduleDraw);
+  document.getElementById("reset").addEventListener("click", reset);
+
+  reset();
+})();
+</script>
+</body>
+</html>
+"""
+
+
+if __name__ == "__main__":
+    main()